@@ -1,16 +1,50 @@
 #!/usr/bin/env python3
 """家計簿アプリ - Flask APIサーバー（複式簿記 + キャッシュフロー + 長期資産/負債対応版）"""
 
-import json
+import atexit
+import bisect
+import copy
+import functools
+import hashlib
+import mmap
 import os
 import shutil
+import threading
+import time
 import calendar as cal
+from collections import defaultdict
 from datetime import date, timedelta
-from flask import Flask, jsonify, request, render_template, send_file, send_from_directory
+from operator import itemgetter
+import orjson
+from flask import Flask, g, jsonify, request, render_template, send_file, send_from_directory
+from flask.json.provider import JSONProvider
+
+
+class OrjsonProvider(JSONProvider):
+    """jsonify / request.get_json を orjson で処理する"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, option=orjson.OPT_SORT_KEYS),
+                                        mimetype="application/json")
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.json")
+JOURNAL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data.log")
+SAVE_DELAY = 30           # スナップショット（data.json）再構築までの待ち時間（秒）
+SAVE_MAX_PENDING = 200    # ジャーナルにこの件数の変更が溜まったら即時再構築
+BACKUP_INTERVAL = 600     # バックアップ世代を回す最短間隔（秒）
+SCHEMA_VERSION = 1        # migrate_data の移行内容の版
+RESPONSE_CACHE_MAX = 256  # GET レスポンス本文キャッシュの最大件数
 
 DEFAULT_DATA = {
     "accounts": [
@@ -36,17 +70,47 @@ DEFAULT_DATA = {
     "tags": [],
 }
 
+# パース済みデータのキャッシュ（data.json の mtime が変わらない限り再読込しない）
+# dirty: 未書き込みの変更あり / pending: 溜まっている変更件数
+# version: メモリ上のデータが変わるたびに増える（レスポンスキャッシュの無効化用）
+_CACHE = {"data": None, "mtime": 0, "dirty": False, "pending": 0, "timer": None, "version": 0,
+          "backup_at": float("-inf")}
+_LOCK = threading.RLock()
+
 
 def load_data():
-    if not os.path.exists(DATA_FILE):
-        save_data(DEFAULT_DATA)
-        return DEFAULT_DATA.copy()
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return migrate_data(data)
+    with _LOCK:
+        if _CACHE["dirty"]:
+            # ディスクより新しい変更がメモリにある
+            return _CACHE["data"]
+        if os.path.exists(DATA_FILE):
+            mtime = os.stat(DATA_FILE).st_mtime_ns
+            if _CACHE["data"] is not None and _CACHE["mtime"] == mtime:
+                return _CACHE["data"]
+            # mmap したページをそのまま渡し、ファイル全体の bytes コピーを作らない
+            with open(DATA_FILE, "rb") as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                    memoryview(mm) as buf:
+                data = orjson.loads(buf)
+        else:
+            data = copy.deepcopy(DEFAULT_DATA)
+        # 前回のスナップショット以降の変更をジャーナルから再適用
+        replayed, torn = replay_journal(data)
+        data = migrate_data(data)
+        # 途切れた行を残すと次の追記がその後ろに繋がり、以降の変更ごと読めなくなる
+        if replayed or torn or not os.path.exists(DATA_FILE):
+            compact_data(data)
+        build_indexes(data)
+        _CACHE["data"] = data
+        _CACHE["mtime"] = os.stat(DATA_FILE).st_mtime_ns
+        _CACHE["version"] += 1
+        return data
 
 
 def migrate_data(data):
+    # 移行済みのデータはチェック自体を省く（移行処理を追加したら SCHEMA_VERSION を上げる）
+    if data.get("schemaVersion") == SCHEMA_VERSION:
+        return data
     changed = False
     if "accounts" not in data:
         old_balance = data.pop("balance", 0)
@@ -65,7 +129,7 @@ def migrate_data(data):
                 inc["accountId"] = 2
         changed = True
     if "categories" not in data:
-        data["categories"] = DEFAULT_DATA["categories"].copy()
+        data["categories"] = copy.deepcopy(DEFAULT_DATA["categories"])
         changed = True
     if "tags" not in data:
         data["tags"] = []
@@ -91,24 +155,229 @@ def migrate_data(data):
             "balance": 0,
         })
         changed = True
+    if data.get("schemaVersion") != SCHEMA_VERSION:
+        data["schemaVersion"] = SCHEMA_VERSION
+        changed = True
     if changed:
         save_data(data)
     return data
 
 
 def save_data(data):
-    # ローテーションバックアップ（bak1→bak2→bak3 の3世代保持）
-    if os.path.exists(DATA_FILE):
-        bak1 = DATA_FILE + ".bak1"
-        bak2 = DATA_FILE + ".bak2"
-        bak3 = DATA_FILE + ".bak3"
-        if os.path.exists(bak2):
-            shutil.copy2(bak2, bak3)
-        if os.path.exists(bak1):
-            shutil.copy2(bak1, bak2)
-        shutil.copy2(DATA_FILE, bak1)
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with _LOCK:
+        # ローテーションバックアップ（bak1→bak2→bak3 の3世代保持）
+        # 書き出しのたびに回すと数十秒前の世代しか残らないので BACKUP_INTERVAL ごとに1回
+        now = time.monotonic()
+        if os.path.exists(DATA_FILE) and now - _CACHE["backup_at"] >= BACKUP_INTERVAL:
+            _CACHE["backup_at"] = now
+            bak1 = DATA_FILE + ".bak1"
+            bak2 = DATA_FILE + ".bak2"
+            bak3 = DATA_FILE + ".bak3"
+            # data.json は常に os.replace で差し替えるので、旧版はハードリンクで残せばコピー不要
+            if os.path.exists(bak2):
+                os.replace(bak2, bak3)
+            if os.path.exists(bak1):
+                os.replace(bak1, bak2)
+            try:
+                os.link(DATA_FILE, bak1)
+            except OSError:
+                # ハードリンク非対応のファイルシステム
+                shutil.copy2(DATA_FILE, bak1)
+        # "_" で始まるキーはメモリ上の索引なので保存しない
+        snapshot = {k: v for k, v in data.items() if not k.startswith("_")}
+        # 一時ファイルに書いて fsync → rename（書き込み途中で落ちても元ファイルは壊れない）
+        tmp = DATA_FILE + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(orjson.dumps(snapshot, option=orjson.OPT_INDENT_2))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, DATA_FILE)
+        _CACHE["data"] = data
+        _CACHE["mtime"] = os.stat(DATA_FILE).st_mtime_ns
+
+
+def append_journal(op, payload):
+    """変更1件をこのリクエストの変更として溜める（mark_dirty で data.log に書く）"""
+    g.setdefault("journal", []).append(dict(payload, op=op))
+
+
+def write_journal():
+    """このリクエストで溜めた変更を1行の JSON として data.log に追記する
+    （取引と口座残高のように一緒に変わるものを、再適用時に片方だけ反映させない）"""
+    records = g.pop("journal", None)
+    if not records:
+        return
+    record = records[0] if len(records) == 1 else {"op": "batch", "records": records}
+    line = orjson.dumps(record) + b"\n"
+    with _LOCK, open(JOURNAL_FILE, "ab") as f:
+        f.write(line)
+
+
+def journal_put(key, item):
+    """data[key] の要素を id で追加/置換"""
+    append_journal("put", {"key": key, "item": item})
+
+
+def journal_delete(key, item_id):
+    """data[key] から id の要素を削除"""
+    append_journal("delete", {"key": key, "id": item_id})
+
+
+def journal_set(data, key):
+    """data[key] を丸ごと置換（口座・タグ・カテゴリなど小さいもの用）"""
+    append_journal("set", {"key": key, "value": data[key]})
+
+
+def apply_journal_record(data, rec, positions):
+    """ジャーナルの1レコードを data に適用する
+    positions: {key: {id: data[key] 内の位置}}（put ごとの線形探索を避ける）"""
+    op = rec["op"]
+    if op == "batch":
+        for sub in rec["records"]:
+            apply_journal_record(data, sub, positions)
+        return
+    key = rec["key"]
+    if op == "set":
+        data[key] = rec["value"]
+        positions.pop(key, None)
+    elif op == "put":
+        items = data.setdefault(key, [])
+        pos = positions.get(key)
+        if pos is None:
+            pos = positions[key] = {x["id"]: i for i, x in enumerate(items)}
+        item = rec["item"]
+        i = pos.get(item["id"])
+        if i is None:
+            pos[item["id"]] = len(items)
+            items.append(item)
+        else:
+            items[i] = item
+    elif op == "delete":
+        data[key] = [x for x in data.get(key, []) if x["id"] != rec["id"]]
+        positions.pop(key, None)
+
+
+def replay_journal(data):
+    """data.log の変更を data に順に適用し、(適用件数, 壊れた行で止まったか) を返す"""
+    if not os.path.exists(JOURNAL_FILE):
+        return 0, False
+    count = 0
+    torn = False
+    positions = {}
+    with open(JOURNAL_FILE, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rec = orjson.loads(line)
+            except ValueError:
+                torn = True  # 書き込み途中で途切れた末尾行（その変更は丸ごと捨てる）
+                break
+            apply_journal_record(data, rec, positions)
+            count += 1
+    return count, torn
+
+
+def compact_data(data):
+    """スナップショットを書き出し、ジャーナルを空にする"""
+    with _LOCK:
+        save_data(data)
+        if os.path.exists(JOURNAL_FILE):
+            os.remove(JOURNAL_FILE)
+
+
+def mark_dirty(data, count=1):
+    """変更をキャッシュに反映し、スナップショット再構築は SAVE_DELAY 後にまとめて行う
+    （呼び出し側が journal_* で溜めた変更はここで1行にまとめてジャーナルへ書く。
+    count は SAVE_MAX_PENDING に数える変更件数）"""
+    with _LOCK:
+        write_journal()
+        _CACHE["data"] = data
+        _CACHE["dirty"] = True
+        _CACHE["pending"] += count
+        _CACHE["version"] += 1
+        if _CACHE["pending"] >= SAVE_MAX_PENDING:
+            flush_data()
+        elif _CACHE["timer"] is None:
+            timer = threading.Timer(SAVE_DELAY, flush_data)
+            timer.daemon = True
+            _CACHE["timer"] = timer
+            timer.start()
+
+
+def flush_data():
+    """溜まっている変更で data.json を再構築し、ジャーナルを空にする"""
+    with _LOCK:
+        timer = _CACHE["timer"]
+        if timer is not None:
+            timer.cancel()
+            _CACHE["timer"] = None
+        if not _CACHE["dirty"]:
+            return
+        compact_data(_CACHE["data"])
+        _CACHE["dirty"] = False
+        _CACHE["pending"] = 0
+
+
+atexit.register(flush_data)
+
+
+# GET のレスポンス本文キャッシュ {(version, 関数名, 読むクエリの値, 今日): (JSON bytes, ETag)}
+_RESPONSES = {"version": None, "bodies": {}}
+
+
+def data_file_changed():
+    """data.json がこのプロセスの外で書き換えられたか（_LOCK を取らず mtime だけ見る）"""
+    if _CACHE["dirty"]:
+        return False
+    try:
+        return os.stat(DATA_FILE).st_mtime_ns != _CACHE["mtime"]
+    except FileNotFoundError:
+        return True
+
+
+def render_cached(view, key, args, kwargs):
+    """_LOCK 内で最新のデータを読み、本文が無ければ view で作ってキャッシュする"""
+    with _LOCK:
+        # 外部更新で読み直していれば version も進むので、ここで最新の data を取り直す
+        g.data = load_data()
+        version = _CACHE["version"]
+        if _RESPONSES["version"] != version:
+            _RESPONSES["version"] = version
+            _RESPONSES["bodies"] = {}
+        bodies = _RESPONSES["bodies"]
+        key = (version,) + key
+        cached = bodies.get(key)
+        if cached is None:
+            body = view(*args, **kwargs).get_data()
+            cached = (body, hashlib.blake2b(body, digest_size=16).hexdigest())
+            # month の値を変え続けるリクエストでも際限なく増えないよう上限で捨てる
+            if len(bodies) >= RESPONSE_CACHE_MAX:
+                bodies.clear()
+            bodies[key] = cached
+        return cached
+
+
+def cached_json(*arg_names):
+    """データと日付が同じ間は前回の JSON レスポンス本文をそのまま返す
+    本文のハッシュを ETag として付け、If-None-Match が一致すれば 304 を返す
+    arg_names: ビューが読むクエリ引数（それ以外の引数や並び順ではキャッシュを分けない）"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (view.__name__, tuple(request.args.get(name) for name in arg_names),
+                   date.today().isoformat())
+            # 命中すれば _LOCK を取らずに返す（キーに version を含むので、更新中でも
+            # 確定済みの版の本文しか返さない）。外れたら本文（とメモ）を _LOCK 内で作る
+            cached = _RESPONSES["bodies"].get((_CACHE["version"],) + key)
+            if cached is None or data_file_changed():
+                cached = render_cached(view, key, args, kwargs)
+            body, etag = cached
+            resp = app.response_class(body, mimetype="application/json")
+            resp.set_etag(etag)
+            return resp.make_conditional(request)
+        return wrapper
+    return decorator
 
 
 def next_id(items):
@@ -117,23 +386,172 @@ def next_id(items):
     return max(item["id"] for item in items) + 1
 
 
+def alloc_id(data, key, n=1):
+    """data[key] の新しい id を n 個ぶん確保し、先頭の id を返す（毎回の max 走査をしない）"""
+    first = data["_next_id"][key]
+    data["_next_id"][key] = first + n
+    return first
+
+
+def build_indexes(data):
+    """id → 要素 の索引を data に付与（口座・取引の追加/削除時は併せて更新する）"""
+    data["_accounts_by_id"] = {a["id"]: a for a in data["accounts"]}
+    data["_tx_by_id"] = {}
+    data["_tx_by_month"] = {}
+    data["_tx_refs"] = defaultdict(int)  # {acc_id: その口座を参照する取引数}
+    for t in data["transactions"]:
+        index_tx(data, t)
+    data["_tags_set"] = set(data["tags"])
+    data["_next_id"] = {key: next_id(data[key])
+                        for key in ("accounts", "transactions", "fixedCosts")}
+    data["_cat_sets"] = {t: set(names) for t, names in data["categories"].items()}
+
+
+def ref_tx_accounts(data, tx, sign):
+    """取引が参照する口座の参照数を sign(+1/-1) だけ増減"""
+    for key in ("accountId", "fromAccountId", "toAccountId"):
+        acc_id = tx.get(key)
+        if acc_id is not None:
+            data["_tx_refs"][acc_id] += sign
+
+
+def index_tx(data, tx):
+    """取引を id 索引と月別索引（"YYYY-MM" → 取引リスト、id順）に登録"""
+    data["_tx_by_id"][tx["id"]] = tx
+    ref_tx_accounts(data, tx, +1)
+    month_txs = data["_tx_by_month"].setdefault(tx["date"][:7], [])
+    if month_txs and month_txs[-1]["id"] > tx["id"]:
+        bisect.insort(month_txs, tx, key=lambda t: t["id"])
+    else:
+        month_txs.append(tx)
+
+
+def unindex_tx(data, tx):
+    """取引を id 索引と月別索引から外す"""
+    del data["_tx_by_id"][tx["id"]]
+    ref_tx_accounts(data, tx, -1)
+    data["_tx_by_month"][tx["date"][:7]].remove(tx)
+
+
+def remove_tx(data, tx):
+    """取引を一覧から外す（一覧は id 順なので二分探索で位置を求める）"""
+    txs = data["transactions"]
+    i = bisect.bisect_left(txs, tx["id"], key=itemgetter("id"))
+    if i < len(txs) and txs[i] is tx:
+        del txs[i]
+    else:
+        txs.remove(tx)  # id 順に並んでいない古いデータ
+
+
+def tx_for_month(data, ym):
+    """指定月（"YYYY-MM"）の取引リスト"""
+    return data["_tx_by_month"].get(ym, [])
+
+
+def register_tags(data, tags):
+    """未登録のタグを data["tags"] に追加し、追加があれば True を返す"""
+    added = False
+    for tag in tags:
+        if tag and tag not in data["_tags_set"]:
+            data["_tags_set"].add(tag)
+            data["tags"].append(tag)
+            added = True
+    return added
+
+
 def get_account(data, account_id):
-    return next((a for a in data["accounts"] if a["id"] == account_id), None)
+    return data["_accounts_by_id"].get(account_id)
+
 
+def account_name(data, account_id):
+    """口座名（口座が無ければ空文字）"""
+    acc = data["_accounts_by_id"].get(account_id)
+    return acc["name"] if acc else ""
+
+
+def today_ctx():
+    """今日の (date, "YYYY-MM-DD", "YYYY-MM")。リクエストの先頭で1回だけ求めて使い回す"""
+    today = date.today()
+    today_iso = today.isoformat()
+    return today, today_iso, today_iso[:7]
 
-def calc_pending_income(data):
+
+def calc_pending_income(data, today_iso):
     """未到着の収入を計算（未来日付のincome取引で流動資産口座に記録されたもの）
-    帳簿残高に含まれてるが実際にはまだ届いてないお金"""
-    today_iso = date.today().isoformat()
+    帳簿残高に含まれてるが実際にはまだ届いてないお金
+    結果はデータの版と日付が同じ間 data["_pending"] に覚えておく"""
+    key = (_CACHE["version"], today_iso)
+    memo = data.get("_pending")
+    if memo and memo[0] == key:
+        return memo[1]
     total = 0
     tx_ids = set()
-    for tx in data["transactions"]:
-        if tx["type"] == "income" and tx["date"] > today_iso:
-            acc = get_account(data, tx.get("accountId"))
-            if acc and acc.get("class") == "current":
-                total += tx["amount"]
-                tx_ids.add(tx["id"])
-    return total, tx_ids
+    # 未来日付は今月以降の月バケットにしかないので、そこだけ見る
+    today_ym = today_iso[:7]
+    for ym, month_txs in data["_tx_by_month"].items():
+        if ym < today_ym:
+            continue
+        for tx in month_txs:
+            if tx["type"] == "income" and tx["date"] > today_iso:
+                acc = get_account(data, tx.get("accountId"))
+                if acc and acc.get("class") == "current":
+                    total += tx["amount"]
+                    tx_ids.add(tx["id"])
+    result = (total, frozenset(tx_ids))
+    data["_pending"] = (key, result)
+    return result
+
+
+EXPENSE_TYPES = frozenset(("expense", "cc_detail"))  # 支出として数える取引種別（CC明細を含む）
+EXPENSE_INCOME_TYPES = frozenset(("expense", "income"))
+
+# 取引種別 × 口座種別 → 残高への符号（transfer は出金側/入金側に分けて引く。cc_detail は残高に影響しない）
+BALANCE_SIGN = {
+    ("expense", "asset"): -1,
+    ("expense", "liability"): +1,
+    ("income", "asset"): +1,
+    ("income", "liability"): +1,
+    ("transfer_from", "asset"): -1,
+    ("transfer_from", "liability"): -1,
+    ("transfer_to", "asset"): +1,
+    ("transfer_to", "liability"): -1,
+}
+
+
+def apply_tx_balance(data, tx, sign):
+    """取引の残高への影響を口座に反映（sign=+1 で計上、-1 で取消）"""
+    amount = tx["amount"] * sign
+    if tx["type"] == "transfer":
+        postings = (("transfer_from", tx.get("fromAccountId")), ("transfer_to", tx.get("toAccountId")))
+    else:
+        postings = ((tx["type"], tx.get("accountId")),)
+    for kind, acc_id in postings:
+        acc = get_account(data, acc_id)
+        if acc:
+            acc["balance"] += BALANCE_SIGN.get((kind, acc["type"]), 0) * amount
+
+
+@app.before_request
+def load_request_data():
+    """更新 API リクエストごとにデータを1回だけ読み込み g.data で共有する
+    （共有の dict を書き換えるので、リクエスト中は _LOCK を保持する。
+    GET は cached_json がキャッシュに無いときだけ _LOCK 内で読み込む）"""
+    if request.path.startswith("/api/") and request.method not in ("GET", "HEAD"):
+        _LOCK.acquire()
+        g.data_locked = True
+        g.data = load_data()
+
+
+@app.teardown_request
+def release_request_data(exc):
+    if g.pop("data_locked", False):
+        if exc is not None:
+            # 途中で失敗した更新をメモリに残さない（ジャーナル済みの変更だけを読み直す）
+            timer = _CACHE["timer"]
+            if timer is not None:
+                timer.cancel()
+            _CACHE.update(data=None, dirty=False, pending=0, timer=None)
+        _LOCK.release()
 
 
 # ─── Pages ───
@@ -151,8 +569,9 @@ def service_worker():
 # ─── Accounts ───
 
 @app.route("/api/accounts", methods=["GET"])
+@cached_json()
 def get_accounts():
-    data = load_data()
+    data = g.data
     result = []
     for a in data["accounts"]:
         acc = dict(a)
@@ -163,10 +582,10 @@ def get_accounts():
 
 @app.route("/api/accounts", methods=["POST"])
 def add_account():
-    data = load_data()
+    data = g.data
     body = request.get_json()
     acc = {
-        "id": next_id(data["accounts"]),
+        "id": alloc_id(data, "accounts"),
         "name": body["name"],
         "type": body.get("type", "asset"),
         "class": body.get("class", "current"),
@@ -176,22 +595,27 @@ def add_account():
         acc["payDay"] = int(body.get("payDay", 0))
         acc["payFromAccountId"] = int(body.get("payFromAccountId", 0))
     data["accounts"].append(acc)
-    save_data(data)
+    data["_accounts_by_id"][acc["id"]] = acc
+    journal_put("accounts", acc)
+    mark_dirty(data)
     return jsonify(acc), 201
 
 
 @app.route("/api/accounts/<int:acc_id>", methods=["PUT"])
 def update_account(acc_id):
-    data = load_data()
+    data = g.data
     acc = get_account(data, acc_id)
     if not acc:
         return jsonify({"error": "not found"}), 404
     body = request.get_json()
+    # 数値は先にまとめて変換する（不正な値でも口座を書き換える前に失敗させる）
+    new_balance = int(body["balance"]) if "balance" in body else None
+    pay_day = int(body["payDay"]) if "payDay" in body else None
+    pay_from = int(body["payFromAccountId"]) if "payFromAccountId" in body else None
     acc["name"] = body.get("name", acc["name"])
     acc["type"] = body.get("type", acc["type"])
     acc["class"] = body.get("class", acc.get("class", "current"))
-    if "balance" in body:
-        new_balance = int(body["balance"])
+    if new_balance is not None:
         old_balance = acc["balance"]
         diff = new_balance - old_balance
         if diff != 0:
@@ -201,7 +625,7 @@ def update_account(acc_id):
             else:
                 tx_type = "expense" if diff > 0 else "income"
             adj_tx = {
-                "id": next_id(data["transactions"]),
+                "id": alloc_id(data, "transactions"),
                 "date": date.today().isoformat(),
                 "amount": abs(diff),
                 "type": tx_type,
@@ -214,57 +638,57 @@ def update_account(acc_id):
             # 残高は仕訳で自動調整されるので直接セット
             acc["balance"] = new_balance
             data["transactions"].append(adj_tx)
+            index_tx(data, adj_tx)
+            journal_put("transactions", adj_tx)
     if acc["type"] == "liability" and acc.get("class") == "current":
-        if "payDay" in body:
-            acc["payDay"] = int(body["payDay"])
-        if "payFromAccountId" in body:
-            acc["payFromAccountId"] = int(body["payFromAccountId"])
-    save_data(data)
+        if pay_day is not None:
+            acc["payDay"] = pay_day
+        if pay_from is not None:
+            acc["payFromAccountId"] = pay_from
+    journal_put("accounts", acc)
+    mark_dirty(data)
     return jsonify(acc)
 
 
 @app.route("/api/accounts/reorder", methods=["POST"])
 def reorder_accounts():
-    data = load_data()
+    data = g.data
     ids = request.get_json().get("ids", [])
     acc_map = {a["id"]: a for a in data["accounts"]}
     data["accounts"] = [acc_map[i] for i in ids if i in acc_map]
-    save_data(data)
+    data["_accounts_by_id"] = {a["id"]: a for a in data["accounts"]}
+    journal_set(data, "accounts")
+    mark_dirty(data)
     return jsonify({"ok": True})
 
 
 @app.route("/api/accounts/<int:acc_id>", methods=["DELETE"])
 def delete_account(acc_id):
-    data = load_data()
-    has_tx = any(
-        t.get("accountId") == acc_id
-        or t.get("fromAccountId") == acc_id
-        or t.get("toAccountId") == acc_id
-        for t in data["transactions"]
-    )
-    if has_tx:
+    data = g.data
+    if data["_tx_refs"].get(acc_id):
         return jsonify({"error": "この口座は取引で使用されているため削除できません"}), 400
     data["accounts"] = [a for a in data["accounts"] if a["id"] != acc_id]
-    save_data(data)
+    data["_accounts_by_id"].pop(acc_id, None)
+    journal_delete("accounts", acc_id)
+    mark_dirty(data)
     return jsonify({"ok": True})
 
 
 # ─── Transactions ───
 
 @app.route("/api/transactions", methods=["GET"])
+@cached_json()
 def get_transactions():
-    data = load_data()
+    data = g.data
     return jsonify(data["transactions"])
 
 
-@app.route("/api/transactions", methods=["POST"])
-def add_transaction():
-    data = load_data()
-    body = request.get_json()
+def new_transaction(data, body, tx_id):
+    """リクエスト本文から取引を組み立てる（口座が見つからなければ None）"""
     tx_type = body["type"]
 
     tx = {
-        "id": next_id(data["transactions"]),
+        "id": tx_id,
         "date": body["date"],
         "amount": int(body["amount"]),
         "type": tx_type,
@@ -279,169 +703,143 @@ def add_transaction():
         tx["toAccountId"] = int(body["toAccountId"])
         tx["category"] = "口座間移動"
 
-        from_acc = get_account(data, tx["fromAccountId"])
-        to_acc = get_account(data, tx["toAccountId"])
-        if not from_acc or not to_acc:
-            return jsonify({"error": "口座が見つかりません"}), 400
-
-        from_acc["balance"] -= tx["amount"]
-        if to_acc["type"] == "liability":
-            to_acc["balance"] -= tx["amount"]
-        else:
-            to_acc["balance"] += tx["amount"]
-    elif tx_type == "cc_detail":
-        # CC明細: P/L・分析用に記録するが残高は変えない
-        tx["accountId"] = int(body["accountId"])
-        acc = get_account(data, tx["accountId"])
-        if not acc:
-            return jsonify({"error": "口座が見つかりません"}), 400
-        # 残高操作なし
+        if not get_account(data, tx["fromAccountId"]) or not get_account(data, tx["toAccountId"]):
+            return None
     else:
+        # cc_detail はP/L・分析用に記録するだけで残高は変えない（BALANCE_SIGN に無い）
         tx["accountId"] = int(body["accountId"])
-        acc = get_account(data, tx["accountId"])
-        if not acc:
-            return jsonify({"error": "口座が見つかりません"}), 400
-
-        if tx_type == "expense":
-            if acc["type"] == "liability":
-                acc["balance"] += tx["amount"]
-            else:
-                acc["balance"] -= tx["amount"]
-        elif tx_type == "income":
-            acc["balance"] += tx["amount"]
+        if not get_account(data, tx["accountId"]):
+            return None
+    return tx
 
-    for tag in tx["tags"]:
-        if tag and tag not in data["tags"]:
-            data["tags"].append(tag)
 
+def post_transaction(data, tx):
+    """取引を残高・タグ・索引・ジャーナルに反映（タグが増えたら True）"""
+    apply_tx_balance(data, tx, +1)
+    tags_added = register_tags(data, tx["tags"])
     data["transactions"].append(tx)
-    save_data(data)
+    index_tx(data, tx)
+    journal_put("transactions", tx)
+    return tags_added
+
+
+@app.route("/api/transactions", methods=["POST"])
+def add_transaction():
+    data = g.data
+    body = request.get_json()
+    tx = new_transaction(data, body, data["_next_id"]["transactions"])
+    if tx is None:
+        return jsonify({"error": "口座が見つかりません"}), 400
+    alloc_id(data, "transactions")
+
+    tags_added = post_transaction(data, tx)
+    journal_set(data, "accounts")
+    if tags_added:
+        journal_set(data, "tags")
+    mark_dirty(data)
     return jsonify(tx), 201
 
 
+@app.route("/api/transactions/bulk", methods=["POST"])
+def add_transactions_bulk():
+    """取引をまとめて登録（1件でも口座が無ければ何も登録しない）"""
+    data = g.data
+    bodies = request.get_json()["transactions"]
+    first_id = data["_next_id"]["transactions"]
+    txs = []
+    for i, body in enumerate(bodies):
+        tx = new_transaction(data, body, first_id + i)
+        if tx is None:
+            return jsonify({"error": f"{i + 1}件目: 口座が見つかりません"}), 400
+        txs.append(tx)
+    alloc_id(data, "transactions", len(txs))
+
+    tags_added = False
+    for tx in txs:
+        tags_added = post_transaction(data, tx) or tags_added
+    if txs:
+        journal_set(data, "accounts")
+        if tags_added:
+            journal_set(data, "tags")
+        # ジャーナルは1行でも取引は件数ぶんあるので、件数ぶん SAVE_MAX_PENDING に数える
+        mark_dirty(data, len(txs))
+    return jsonify(txs), 201
+
+
 @app.route("/api/transactions/<int:tx_id>", methods=["PUT"])
 def update_transaction(tx_id):
-    data = load_data()
-    tx = next((t for t in data["transactions"] if t["id"] == tx_id), None)
+    data = g.data
+    tx = data["_tx_by_id"].get(tx_id)
     if not tx:
         return jsonify({"error": "not found"}), 404
     body = request.get_json()
+    # 数値は先にまとめて変換する（不正な値でも残高を戻す前に失敗させる）
+    amount = int(body.get("amount", tx["amount"]))
+    account_id = int(body["accountId"]) if "accountId" in body else None
 
     # 1. 旧仕訳の残高を逆仕訳で戻す
-    if tx["type"] == "cc_detail":
-        pass
-    elif tx["type"] == "transfer":
-        from_acc = get_account(data, tx.get("fromAccountId"))
-        to_acc = get_account(data, tx.get("toAccountId"))
-        if from_acc:
-            from_acc["balance"] += tx["amount"]
-        if to_acc:
-            if to_acc["type"] == "liability":
-                to_acc["balance"] += tx["amount"]
-            else:
-                to_acc["balance"] -= tx["amount"]
-    else:
-        acc = get_account(data, tx.get("accountId"))
-        if acc:
-            if tx["type"] == "expense":
-                if acc["type"] == "liability":
-                    acc["balance"] -= tx["amount"]
-                else:
-                    acc["balance"] += tx["amount"]
-            elif tx["type"] == "income":
-                acc["balance"] -= tx["amount"]
-
-    # 2. フィールド更新
-    tx["date"] = body.get("date", tx["date"])
-    tx["amount"] = int(body.get("amount", tx["amount"]))
+    apply_tx_balance(data, tx, -1)
+
+    # 2. フィールド更新（日付が変わる場合は月別索引を付け替え）
+    if body.get("date", tx["date"]) != tx["date"]:
+        unindex_tx(data, tx)
+        tx["date"] = body["date"]
+        index_tx(data, tx)
+    tx["amount"] = amount
     tx["category"] = body.get("category", tx["category"])
     tx["tags"] = body.get("tags", tx.get("tags", []))
     tx["schedule"] = body.get("schedule", tx.get("schedule", ""))
     tx["memo"] = body.get("memo", tx["memo"])
-    if "accountId" in body:
-        tx["accountId"] = int(body["accountId"])
+    if account_id is not None:
+        ref_tx_accounts(data, tx, -1)
+        tx["accountId"] = account_id
+        ref_tx_accounts(data, tx, +1)
 
     # 3. 新しい残高を適用
-    if tx["type"] == "cc_detail":
-        pass
-    elif tx["type"] == "transfer":
-        from_acc = get_account(data, tx.get("fromAccountId"))
-        to_acc = get_account(data, tx.get("toAccountId"))
-        if from_acc:
-            from_acc["balance"] -= tx["amount"]
-        if to_acc:
-            if to_acc["type"] == "liability":
-                to_acc["balance"] -= tx["amount"]
-            else:
-                to_acc["balance"] += tx["amount"]
-    else:
-        acc = get_account(data, tx.get("accountId"))
-        if acc:
-            if tx["type"] == "expense":
-                if acc["type"] == "liability":
-                    acc["balance"] += tx["amount"]
-                else:
-                    acc["balance"] -= tx["amount"]
-            elif tx["type"] == "income":
-                acc["balance"] += tx["amount"]
+    apply_tx_balance(data, tx, +1)
 
-    for tag in tx.get("tags", []):
-        if tag and tag not in data["tags"]:
-            data["tags"].append(tag)
+    tags_added = register_tags(data, tx.get("tags", []))
 
-    save_data(data)
+    journal_put("transactions", tx)
+    journal_set(data, "accounts")
+    if tags_added:
+        journal_set(data, "tags")
+    mark_dirty(data)
     return jsonify(tx)
 
 
 @app.route("/api/transactions/<int:tx_id>", methods=["DELETE"])
 def delete_transaction(tx_id):
-    data = load_data()
-    tx = next((t for t in data["transactions"] if t["id"] == tx_id), None)
+    data = g.data
+    tx = data["_tx_by_id"].get(tx_id)
     if not tx:
         return jsonify({"error": "not found"}), 404
 
-    if tx["type"] == "cc_detail":
-        pass  # 残高操作なし
-    elif tx["type"] == "transfer":
-        from_acc = get_account(data, tx.get("fromAccountId"))
-        to_acc = get_account(data, tx.get("toAccountId"))
-        if from_acc:
-            from_acc["balance"] += tx["amount"]
-        if to_acc:
-            if to_acc["type"] == "liability":
-                to_acc["balance"] += tx["amount"]
-            else:
-                to_acc["balance"] -= tx["amount"]
-    else:
-        acc = get_account(data, tx.get("accountId"))
-        if acc:
-            if tx["type"] == "expense":
-                if acc["type"] == "liability":
-                    acc["balance"] -= tx["amount"]
-                else:
-                    acc["balance"] += tx["amount"]
-            elif tx["type"] == "income":
-                acc["balance"] -= tx["amount"]
+    apply_tx_balance(data, tx, -1)
 
-    data["transactions"] = [t for t in data["transactions"] if t["id"] != tx_id]
-    save_data(data)
+    remove_tx(data, tx)
+    unindex_tx(data, tx)
+    journal_delete("transactions", tx_id)
+    journal_set(data, "accounts")
+    mark_dirty(data)
     return jsonify({"ok": True})
 
 
 # ─── Fixed Costs ───
 
 @app.route("/api/fixed-costs", methods=["GET"])
+@cached_json()
 def get_fixed_costs():
-    data = load_data()
+    data = g.data
     return jsonify(data["fixedCosts"])
 
 
 @app.route("/api/fixed-costs", methods=["POST"])
 def add_fixed_cost():
-    data = load_data()
+    data = g.data
     body = request.get_json()
     fc = {
-        "id": next_id(data["fixedCosts"]),
+        "id": alloc_id(data, "fixedCosts"),
         "name": body["name"],
         "amount": int(body["amount"]),
         "category": body.get("category", "雑費"),
@@ -449,17 +847,18 @@ def add_fixed_cost():
         "accountId": int(body.get("accountId", data["accounts"][0]["id"])),
         "tags": body.get("tags", []),
     }
-    for tag in fc["tags"]:
-        if tag and tag not in data["tags"]:
-            data["tags"].append(tag)
+    tags_added = register_tags(data, fc["tags"])
     data["fixedCosts"].append(fc)
-    save_data(data)
+    journal_put("fixedCosts", fc)
+    if tags_added:
+        journal_set(data, "tags")
+    mark_dirty(data)
     return jsonify(fc), 201
 
 
 @app.route("/api/fixed-costs/<int:fc_id>", methods=["PUT"])
 def update_fixed_cost(fc_id):
-    data = load_data()
+    data = g.data
     fc = next((f for f in data["fixedCosts"] if f["id"] == fc_id), None)
     if not fc:
         return jsonify({"error": "not found"}), 404
@@ -470,18 +869,20 @@ def update_fixed_cost(fc_id):
     fc["day"] = int(body.get("day", fc["day"]))
     fc["accountId"] = int(body.get("accountId", fc.get("accountId", 1)))
     fc["tags"] = body.get("tags", fc.get("tags", []))
-    for tag in fc["tags"]:
-        if tag and tag not in data["tags"]:
-            data["tags"].append(tag)
-    save_data(data)
+    tags_added = register_tags(data, fc["tags"])
+    journal_put("fixedCosts", fc)
+    if tags_added:
+        journal_set(data, "tags")
+    mark_dirty(data)
     return jsonify(fc)
 
 
 @app.route("/api/fixed-costs/<int:fc_id>", methods=["DELETE"])
 def delete_fixed_cost(fc_id):
-    data = load_data()
+    data = g.data
     data["fixedCosts"] = [f for f in data["fixedCosts"] if f["id"] != fc_id]
-    save_data(data)
+    journal_delete("fixedCosts", fc_id)
+    mark_dirty(data)
     return jsonify({"ok": True})
 
 
@@ -491,75 +892,91 @@ def delete_fixed_cost(fc_id):
 
 @app.route("/api/data", methods=["GET"])
 def download_data():
+    load_data()  # 初回は data.json をここで作る
+    flush_data()
     return send_file(DATA_FILE, as_attachment=True,
                      download_name="kakeibo_backup.json", mimetype="application/json")
 
 
+@app.route("/api/compact", methods=["POST"])
+def compact():
+    """ジャーナルを data.json に畳み込む"""
+    flush_data()
+    return jsonify({"ok": True})
+
+
 # ─── Categories ───
 
 @app.route("/api/categories", methods=["GET"])
+@cached_json()
 def get_categories():
-    data = load_data()
+    data = g.data
     return jsonify(data["categories"])
 
 
 @app.route("/api/categories", methods=["POST"])
 def add_category():
-    data = load_data()
+    data = g.data
     body = request.get_json()
     cat_type = body["type"]
     name = body["name"].strip()
     if not name:
         return jsonify({"error": "名前が空です"}), 400
-    if name in data["categories"].get(cat_type, []):
+    if name in data["_cat_sets"].get(cat_type, ()):
         return jsonify({"error": "既に存在します"}), 400
     data["categories"].setdefault(cat_type, []).append(name)
-    save_data(data)
+    data["_cat_sets"].setdefault(cat_type, set()).add(name)
+    journal_set(data, "categories")
+    mark_dirty(data)
     return jsonify({"ok": True}), 201
 
 
 @app.route("/api/categories", methods=["DELETE"])
 def delete_category():
-    data = load_data()
+    data = g.data
     body = request.get_json()
     cat_type = body["type"]
     name = body["name"]
-    cats = data["categories"].get(cat_type, [])
-    if name in cats:
-        cats.remove(name)
-    save_data(data)
+    if name in data["_cat_sets"].get(cat_type, ()):
+        data["categories"][cat_type].remove(name)
+        data["_cat_sets"][cat_type].discard(name)
+    journal_set(data, "categories")
+    mark_dirty(data)
     return jsonify({"ok": True})
 
 
 # ─── Tags ───
 
 @app.route("/api/tags", methods=["GET"])
+@cached_json()
 def get_tags():
-    data = load_data()
+    data = g.data
     return jsonify(data["tags"])
 
 
 @app.route("/api/tags", methods=["POST"])
 def add_tag():
-    data = load_data()
+    data = g.data
     body = request.get_json()
     tag = body["tag"].strip()
     if not tag:
         return jsonify({"error": "空です"}), 400
-    if tag not in data["tags"]:
-        data["tags"].append(tag)
-        save_data(data)
+    if register_tags(data, [tag]):
+        journal_set(data, "tags")
+        mark_dirty(data)
     return jsonify({"ok": True}), 201
 
 
 @app.route("/api/tags", methods=["DELETE"])
 def delete_tag():
-    data = load_data()
+    data = g.data
     body = request.get_json()
     tag = body["tag"]
-    if tag in data["tags"]:
+    if tag in data["_tags_set"]:
+        data["_tags_set"].discard(tag)
         data["tags"].remove(tag)
-        save_data(data)
+        journal_set(data, "tags")
+        mark_dirty(data)
     return jsonify({"ok": True})
 
 
@@ -571,6 +988,19 @@ def is_cc_account(acc):
             and acc.get("class") == "current" and acc.get("payDay", 0) > 0)
 
 
+def cc_accounts(data):
+    """CC的な口座（payDay を持つ流動負債）の一覧"""
+    return [a for a in data["accounts"] if is_cc_account(a)]
+
+
+def fc_sums_by_account(data):
+    """口座ごとの固定費合計 {acc_id: amount}（CC引落の推計用）"""
+    sums = defaultdict(int)
+    for fc in data["fixedCosts"]:
+        sums[fc.get("accountId")] += fc["amount"]
+    return sums
+
+
 def get_cc_cycle_start(a, today):
     """CC口座の現在の請求サイクル開始日を返す（前回引落日）"""
     pay_day = a.get("payDay", 0)
@@ -589,62 +1019,24 @@ def get_cc_cycle_start(a, today):
 
 # ─── Cash Flow ───
 
-def build_cashflow_events(data, month_key, offset, today):
-    """指定月のキャッシュフローイベント一覧を構築"""
-    _, pending_ids = calc_pending_income(data)
-    events = []
-
-    # 未到着収入
-    for tx in data["transactions"]:
-        if tx["id"] not in pending_ids:
-            continue
-        if not tx["date"].startswith(month_key):
-            continue
+def build_cashflow_events(data, month_key, offset, today, pending_ids):
+    """指定月のキャッシュフローイベント一覧を構築（pending_ids は calc_pending_income の結果）"""
+    # 当月の取引を1パスで種類別に振り分け（並び順は従来どおり 未到着収入→負債口座→CC明細）
+    pending_events = []
+    liability_events = []
+    cc_detail_events = []
+    cc_det_by_acc = defaultdict(int)  # {acc_id: 当月CC明細合計}（来月以降の引落推計用）
+    for tx in tx_for_month(data, month_key):
         day = int(tx["date"][8:10])
-        if offset == 0 and day <= today.day:
-            continue
         acc = get_account(data, tx.get("accountId"))
-        sch = tx.get("schedule", "") or tx.get("category", "収入")
-        events.append({
-            "day": day, "name": sch, "amount": tx["amount"],
-            "type": "income", "account": acc["name"] if acc else "",
-            "cc": False, "liability_pay": False,
-        })
-
-    # 未来の負債口座取引（支払い予定など、CC以外）→ 実際のキャッシュアウト
-    for tx in data["transactions"]:
-        if tx["id"] in pending_ids:
-            continue
-        if not tx["date"].startswith(month_key):
-            continue
-        if tx["type"] not in ("expense", "income"):
-            continue
-        acc = get_account(data, tx.get("accountId"))
-        if not acc or acc["type"] != "liability":
-            continue
-        if is_cc_account(acc):
-            continue
-        day = int(tx["date"][8:10])
-        if offset == 0 and day <= today.day:
-            continue
-        sch = tx.get("schedule", "") or tx.get("category", "")
-        events.append({
-            "day": day, "name": sch,
-            "amount": -tx["amount"] if tx["type"] == "expense" else tx["amount"],
-            "type": tx["type"],
-            "account": acc["name"] if acc else "",
-            "cc": False, "liability_pay": True,
-        })
-
-    # CC明細実績（当月分 — 情報表示のみ、残高計算に影響しない cc=True）
-    if offset == 0:
-        for tx in data["transactions"]:
-            if tx["type"] == "cc_detail" and tx["date"].startswith(month_key):
-                tx_day = int(tx["date"][8:10])
-                acc = get_account(data, tx.get("accountId"))
+        if tx["type"] == "cc_detail":
+            acc_id = tx.get("accountId")
+            cc_det_by_acc[acc_id] += tx["amount"]
+            # CC明細実績（当月分 — 情報表示のみ、残高計算に影響しない cc=True）
+            if offset == 0:
                 cat = tx.get("category", "") or tx.get("memo", "CC明細")
-                events.append({
-                    "day": tx_day,
+                cc_detail_events.append({
+                    "day": day,
                     "name": cat,
                     "amount": -tx["amount"],
                     "type": "cc_detail",
@@ -652,25 +1044,41 @@ def build_cashflow_events(data, month_key, offset, today):
                     "cc": True,   # 情報表示のみ。CC残高は開始残高に織込み済み
                     "liability_pay": False,
                 })
-    # CC引落（payDayがある流動負債）→ 残高計算に影響
-    for a in data["accounts"]:
-        if not is_cc_account(a):
             continue
-        pay_day = a.get("payDay", 0)
-        if not pay_day:
+        if offset == 0 and day <= today.day:
             continue
+        if tx["id"] in pending_ids:
+            # 未到着収入
+            sch = tx.get("schedule") or tx.get("category", "収入")
+            pending_events.append({
+                "day": day, "name": sch, "amount": tx["amount"],
+                "type": "income", "account": acc["name"] if acc else "",
+                "cc": False, "liability_pay": False,
+            })
+        elif (tx["type"] in EXPENSE_INCOME_TYPES and acc and acc["type"] == "liability"
+              and not is_cc_account(acc)):
+            # 未来の負債口座取引（支払い予定など、CC以外）→ 実際のキャッシュアウト
+            sch = tx.get("schedule") or tx.get("category", "")
+            liability_events.append({
+                "day": day, "name": sch,
+                "amount": -tx["amount"] if tx["type"] == "expense" else tx["amount"],
+                "type": tx["type"],
+                "account": acc["name"],
+                "cc": False, "liability_pay": True,
+            })
+    events = pending_events + liability_events + cc_detail_events
+
+    # CC引落（payDayがある流動負債）→ 残高計算に影響
+    fc_sums = fc_sums_by_account(data) if offset else {}
+    for a in cc_accounts(data):
+        pay_day = a["payDay"]
         if offset == 0 and pay_day <= today.day:
             continue
         if offset == 0:
             total = a["balance"]
         else:
             # 来月以降はCC固定費＋記録済みCC明細の合計を推計
-            cc_fc = sum(fc["amount"] for fc in data["fixedCosts"]
-                        if fc.get("accountId") == a["id"])
-            cc_det = sum(t["amount"] for t in data["transactions"]
-                         if t["type"] == "cc_detail" and t.get("accountId") == a["id"]
-                         and t["date"].startswith(month_key))
-            total = cc_fc + cc_det
+            total = fc_sums.get(a["id"], 0) + cc_det_by_acc.get(a["id"], 0)
         if total <= 0:
             continue
         events.append({
@@ -683,63 +1091,59 @@ def build_cashflow_events(data, month_key, offset, today):
         })
 
     # 固定費（CC払いはcc=True情報のみ、直接払いは残高に影響）
-    for fc in data["fixedCosts"]:
-        day = fc["day"]
-        if offset == 0 and day <= today.day:
-            continue
-        acc = get_account(data, fc.get("accountId"))
-        is_cc_fc = is_cc_account(acc)
-        events.append({
-            "day": day, "name": fc["name"],
-            "amount": -fc["amount"], "type": "expense",
-            "account": acc["name"] if acc else "",
-            "cc": is_cc_fc, "liability_pay": False,
-        })
+    events.extend({
+        "day": fc["day"], "name": fc["name"],
+        "amount": -fc["amount"], "type": "expense",
+        "account": account_name(data, fc.get("accountId")),
+        "cc": is_cc_account(get_account(data, fc.get("accountId"))), "liability_pay": False,
+    } for fc in data["fixedCosts"] if offset or fc["day"] > today.day)
 
     # 定期収入
-    for inc in data["incomeSchedule"]:
-        day = inc["day"]
-        if offset == 0 and day <= today.day:
-            continue
-        acc = get_account(data, inc.get("accountId"))
-        events.append({
-            "day": day, "name": inc["name"],
-            "amount": inc["amount"], "type": "income",
-            "account": acc["name"] if acc else "",
-            "cc": False, "liability_pay": False,
-        })
-
-    events.sort(key=lambda e: e["day"])
+    events.extend({
+        "day": inc["day"], "name": inc["name"],
+        "amount": inc["amount"], "type": "income",
+        "account": account_name(data, inc.get("accountId")),
+        "cc": False, "liability_pay": False,
+    } for inc in data["incomeSchedule"] if offset or inc["day"] > today.day)
+
+    events.sort(key=itemgetter("day"))
     return events
 
 
-@app.route("/api/cashflow", methods=["GET"])
-def get_cashflow():
-    data = load_data()
-    today = date.today()
-    ym = f"{today.year}-{today.month:02d}"
-
-    current_assets = sum(a["balance"] for a in data["accounts"]
-                         if a["type"] == "asset" and a.get("class") == "current")
-    current_liabilities = sum(a["balance"] for a in data["accounts"]
-                              if a["type"] == "liability" and a.get("class") == "current")
+def month_cashflow_net(data, month_key, offset, today, pending_ids):
+    """build_cashflow_events のうち残高に効く分（cc=False）の合計
+    データの版・日付が同じ間は月ごとに覚えておく。取引のない来月以降の月は
+    固定費・定期収入・CC固定費だけで毎月同額なので1つにまとめる"""
+    key = (_CACHE["version"], today)
+    memo = data.get("_month_net")
+    if not memo or memo[0] != key:
+        memo = data["_month_net"] = (key, {})
+    nets = memo[1]
+    slot = (month_key if offset == 0 or tx_for_month(data, month_key) else None, offset)
+    if slot not in nets:
+        nets[slot] = sum(e["amount"] for e in
+                         build_cashflow_events(data, month_key, offset, today, pending_ids)
+                         if not e.get("cc"))
+    return nets[slot]
 
-    pending_income, _ = calc_pending_income(data)
-    hand = current_assets - pending_income
 
-    # 今月の実績
-    month_expenses = sum(
-        t["amount"] for t in data["transactions"]
-        if t["type"] in ("expense", "cc_detail") and t["date"].startswith(ym)
-    )
-    month_income = sum(
-        t["amount"] for t in data["transactions"]
-        if t["type"] == "income" and t["date"].startswith(ym)
-    )
+@app.route("/api/cashflow", methods=["GET"])
+@cached_json()
+def get_cashflow():
+    data = g.data
+    today, today_iso, ym = today_ctx()
 
+    # 流動資産・流動負債・CC一覧を口座1パスで集計
+    current_assets = 0
+    current_liabilities = 0
     credit_cards = []
     for a in data["accounts"]:
-        if a["type"] == "liability" and a.get("class") == "current":
+        if a.get("class") != "current":
+            continue
+        if a["type"] == "asset":
+            current_assets += a["balance"]
+        elif a["type"] == "liability":
+            current_liabilities += a["balance"]
             pay_from = get_account(data, a.get("payFromAccountId"))
             credit_cards.append({
                 "name": a["name"], "balance": a["balance"],
@@ -747,6 +1151,18 @@ def get_cashflow():
                 "payFromAccount": pay_from["name"] if pay_from else "",
             })
 
+    pending_income, pending_ids = calc_pending_income(data, today_iso)
+    hand = current_assets - pending_income
+
+    # 今月の実績（取引1パス）
+    month_expenses = 0
+    month_income = 0
+    for t in tx_for_month(data, ym):
+        if t["type"] in EXPENSE_TYPES:
+            month_expenses += t["amount"]
+        elif t["type"] == "income":
+            month_income += t["amount"]
+
     # 手持ちからスタート（CC引落は payDay に自動計上）
     running = hand
     months = []
@@ -759,7 +1175,7 @@ def get_cashflow():
             y += 1
         month_key = f"{y}-{m:02d}"
 
-        events = build_cashflow_events(data, month_key, offset, today)
+        events = build_cashflow_events(data, month_key, offset, today, pending_ids)
 
         month_events = []
         for e in events:
@@ -800,45 +1216,42 @@ def get_cashflow():
 
 # ─── P/L ───
 
+def nest_detail(flat):
+    """{(cat, tag, schedule): amount} → {cat: {tag: {schedule: amount}}}"""
+    detail = {}
+    for (cat, tag_key, sch_key), amount in flat.items():
+        detail.setdefault(cat, {}).setdefault(tag_key, {})[sch_key] = amount
+    return detail
+
+
 @app.route("/api/pl", methods=["GET"])
+@cached_json("month")
 def get_pl():
-    data = load_data()
-    ym = request.args.get("month", date.today().strftime("%Y-%m"))
-    expenses_by_cat = {}
-    income_by_cat = {}
-    # 階層: category > tag > schedule > amount
-    expense_detail = {}  # {cat: {tag: {schedule: amount}}}
-    income_detail = {}
-    for t in data["transactions"]:
-        if not t["date"].startswith(ym):
-            continue
+    data = g.data
+    today, _, today_ym = today_ctx()
+    ym = request.args.get("month", today_ym)
+    # 階層: category > tag > schedule > amount（集計中はフラットなキーで持ち、最後に入れ子化）
+    expense_flat = defaultdict(int)  # {(cat, tag, schedule): amount}
+    income_flat = defaultdict(int)
+    for t in tx_for_month(data, ym):
         cat = t.get("category", "その他")
         tags = t.get("tags", [])
-        schedule = t.get("schedule", "") or ""
+        schedule = t.get("schedule") or ""
         tag_key = ", ".join(tags) if tags else "(タグなし)"
         sch_key = schedule if schedule else "(予定なし)"
         if t["type"] == "cc_detail":
             # CC明細のみ費用として計上（残高への影響なし）
-            expenses_by_cat[cat] = expenses_by_cat.get(cat, 0) + t["amount"]
-            expense_detail.setdefault(cat, {}).setdefault(tag_key, {})
-            expense_detail[cat][tag_key][sch_key] = expense_detail[cat][tag_key].get(sch_key, 0) + t["amount"]
+            expense_flat[(cat, tag_key, sch_key)] += t["amount"]
         elif t["type"] == "expense":
             # CC口座への支出はcc_detailで管理するためP/L除外、支払い予定など非CC負債は計上
             acc = get_account(data, t.get("accountId"))
             if acc and is_cc_account(acc):
                 pass  # CCはスキップ
             else:
-                expenses_by_cat[cat] = expenses_by_cat.get(cat, 0) + t["amount"]
-                expense_detail.setdefault(cat, {}).setdefault(tag_key, {})
-                expense_detail[cat][tag_key][sch_key] = expense_detail[cat][tag_key].get(sch_key, 0) + t["amount"]
+                expense_flat[(cat, tag_key, sch_key)] += t["amount"]
         elif t["type"] == "income":
-            income_by_cat[cat] = income_by_cat.get(cat, 0) + t["amount"]
-            income_detail.setdefault(cat, {}).setdefault(tag_key, {})
-            income_detail[cat][tag_key][sch_key] = income_detail[cat][tag_key].get(sch_key, 0) + t["amount"]
+            income_flat[(cat, tag_key, sch_key)] += t["amount"]
     # CC払いの固定費を当月P/Lに自動計上
-    today = date.today()
-    today_ym = today.strftime("%Y-%m")
-    pl_fc_by_acc = {}  # {acc_id: sum} 固定費CC分の合計（unjournaled計算用）
     for fc in data["fixedCosts"]:
         fc_acc = get_account(data, fc.get("accountId"))
         if not fc_acc or not is_cc_account(fc_acc):
@@ -849,20 +1262,26 @@ def get_pl():
         cat = fc.get("category", "雑費")
         tags = fc.get("tags", [])
         tag_key = ", ".join(tags) if tags else "(タグなし)"
-        expenses_by_cat[cat] = expenses_by_cat.get(cat, 0) + fc["amount"]
-        expense_detail.setdefault(cat, {}).setdefault(tag_key, {})
-        expense_detail[cat][tag_key]["(固定費)"] = expense_detail[cat][tag_key].get("(固定費)", 0) + fc["amount"]
-        acc_id = fc_acc["id"]
-        pl_fc_by_acc[acc_id] = pl_fc_by_acc.get(acc_id, 0) + fc["amount"]
-
-    total_income = sum(income_by_cat.values())
-    total_expenses = sum(expenses_by_cat.values())
+        expense_flat[(cat, tag_key, "(固定費)")] += fc["amount"]
+
+    # カテゴリ別合計・総額はフラット集計から導出
+    expenses_by_cat = defaultdict(int)
+    total_expenses = 0
+    for (cat, _, _), amount in expense_flat.items():
+        expenses_by_cat[cat] += amount
+        total_expenses += amount
+    income_by_cat = defaultdict(int)
+    total_income = 0
+    for (cat, _, _), amount in income_flat.items():
+        income_by_cat[cat] += amount
+        total_income += amount
+
     return jsonify({
         "month": ym,
-        "income": income_by_cat,
-        "expenses": expenses_by_cat,
-        "expenseDetail": expense_detail,
-        "incomeDetail": income_detail,
+        "income": dict(income_by_cat),
+        "expenses": dict(expenses_by_cat),
+        "expenseDetail": nest_detail(expense_flat),
+        "incomeDetail": nest_detail(income_flat),
         "totalIncome": total_income,
         "totalExpenses": total_expenses,
         "netIncome": total_income - total_expenses,
@@ -871,77 +1290,125 @@ def get_pl():
 
 # ─── Calendar ───
 
+def calendar_accounts(data):
+    """カレンダー用の口座分類（データの版が同じ間は使い回す）
+    (流動資産合計, 流動資産ID, CC口座一覧, CC口座ID, CC以外の負債口座ID)"""
+    memo = data.get("_calendar_accounts")
+    if memo and memo[0] == _CACHE["version"]:
+        return memo[1]
+    current_assets = 0
+    current_asset_ids = set()
+    cc_accs = []
+    cc_ids = set()
+    other_liability_ids = set()  # 支払い予定など
+    for a in data["accounts"]:
+        if a["type"] == "asset" and a.get("class") == "current":
+            current_assets += a["balance"]
+            current_asset_ids.add(a["id"])
+        elif is_cc_account(a):
+            cc_accs.append(a)
+            cc_ids.add(a["id"])
+        elif a["type"] == "liability":
+            other_liability_ids.add(a["id"])
+    result = (current_assets, current_asset_ids, cc_accs, cc_ids, other_liability_ids)
+    data["_calendar_accounts"] = (_CACHE["version"], result)
+    return result
+
+
+def month_asset_deltas(data, current_asset_ids):
+    """月ごとの流動資産の増減 {"YYYY-MM": income - expense}（データの版が同じ間は使い回す）"""
+    memo = data.get("_asset_deltas")
+    if memo and memo[0] == _CACHE["version"]:
+        return memo[1]
+    deltas = {}
+    for mk, month_txs in data["_tx_by_month"].items():
+        delta = 0
+        for tx in month_txs:
+            if tx["type"] in EXPENSE_INCOME_TYPES and tx.get("accountId") in current_asset_ids:
+                delta += -tx["amount"] if tx["type"] == "expense" else tx["amount"]
+        deltas[mk] = delta
+    data["_asset_deltas"] = (_CACHE["version"], deltas)
+    return deltas
+
+
+def build_tx_events(txs):
+    """取引リストからイベントリストを構築（同じ予定はグループ化）"""
+    evts = []          # 予定ごとのイベント（最初に出た順、種別は最初の取引のもの）
+    sched_events = {}  # {予定: evts 内のイベント}
+    no_schedule = []
+    for tx in txs:
+        amt = -tx["amount"] if tx["type"] in EXPENSE_TYPES else tx["amount"]
+        sch = tx.get("schedule")
+        if sch:
+            evt = sched_events.get(sch)
+            if evt is None:
+                evt = sched_events[sch] = {"name": sch, "amount": 0, "type": tx["type"], "actual": True}
+                evts.append(evt)
+            evt["amount"] += amt
+        else:
+            cat = tx.get("category", "")
+            memo = tx.get("memo", "")
+            if cat and memo:
+                name = cat + " - " + memo
+            else:
+                name = cat or memo or "取引"
+            no_schedule.append({
+                "name": name,
+                "amount": amt, "type": tx["type"], "actual": True,
+            })
+    evts.extend(no_schedule)
+    return evts
+
+
 @app.route("/api/calendar", methods=["GET"])
+@cached_json("month")
 def get_calendar():
-    data = load_data()
-    month_str = request.args.get("month", date.today().strftime("%Y-%m"))
+    data = g.data
+    today, today_iso, this_ym = today_ctx()
+    month_str = request.args.get("month", this_ym)
     year, month = map(int, month_str.split("-"))
-    today = date.today()
-    this_ym = today.strftime("%Y-%m")
+    is_past_month = month_str < this_ym
+    is_current_month = month_str == this_ym
+    is_future_month = month_str > this_ym
 
     num_days = cal.monthrange(year, month)[1]
     first_dow = (date(year, month, 1).weekday() + 1) % 7
 
-    current_assets = sum(a["balance"] for a in data["accounts"]
-                         if a["type"] == "asset" and a.get("class") == "current")
+    (current_assets, current_asset_ids,
+     cc_accs, cc_ids, other_liability_ids) = calendar_accounts(data)
 
-    pending_income, pending_ids = calc_pending_income(data)
+    pending_income, pending_ids = calc_pending_income(data, today_iso)
     hand = current_assets - pending_income
 
-    # 対象月の記録済み取引を日別に集計
-    tx_by_day = {}
-    for tx in data["transactions"]:
-        if tx["date"].startswith(month_str) and tx["type"] in ("expense", "income", "cc_detail"):
+    # 対象月の記録済み取引を日別に集計（同じパスでCC明細の口座別合計も取る）
+    # 日付で直接引ける固定長リスト（添字 = 日。月末日の大小に関係なく 1〜31 を受けられる長さ）
+    tx_by_day = [[] for _ in range(32)]
+    cc_det_by_acc = defaultdict(int)  # {acc_id: 対象月のCC明細合計}
+    for tx in tx_for_month(data, month_str):
+        if tx["type"] in ("expense", "income", "cc_detail"):
             d = int(tx["date"][8:10])
-            tx_by_day.setdefault(d, []).append(tx)
-
-    def build_tx_events(txs):
-        """取引リストからイベントリストを構築（同じ予定はグループ化）"""
-        schedule_groups = {}
-        no_schedule = []
-        for tx in txs:
-            amt = -tx["amount"] if tx["type"] in ("expense", "cc_detail") else tx["amount"]
-            sch = tx.get("schedule", "")
-            if sch:
-                if sch not in schedule_groups:
-                    schedule_groups[sch] = {"amount": 0, "type": tx["type"]}
-                schedule_groups[sch]["amount"] += amt
-            else:
-                cat = tx.get("category", "")
-                memo = tx.get("memo", "")
-                parts = [p for p in [cat, memo] if p]
-                no_schedule.append({
-                    "name": " - ".join(parts) if parts else "取引",
-                    "amount": amt, "type": tx["type"], "actual": True,
-                })
-        evts = []
-        for sch, g in schedule_groups.items():
-            evts.append({"name": sch, "amount": g["amount"], "type": g["type"], "actual": True})
-        evts.extend(no_schedule)
-        return evts
+            tx_by_day[d].append(tx)
+        if tx["type"] == "cc_detail":
+            acc_id = tx.get("accountId")
+            cc_det_by_acc[acc_id] += tx["amount"]
 
-    if month_str < this_ym:
+    if is_past_month:
         # ── 過去月: リバース＆リプレイ ──
         # 過去月も hand ベースで逆算
         start_balance = hand
-        # 対象月以降の全取引を逆算してスタートを求める（資産口座ベース）
-        for tx in data["transactions"]:
-            if tx["date"] >= f"{year}-{month:02d}-01" and tx["type"] in ("expense", "income"):
-                acc = get_account(data, tx.get("accountId"))
-                if acc and acc["type"] == "asset" and acc.get("class") == "current":
-                    if tx["type"] == "expense":
-                        start_balance += tx["amount"]
-                    elif tx["type"] == "income":
-                        start_balance -= tx["amount"]
+        # 対象月以降の全取引を逆算してスタートを求める（資産口座ベース、月ごとの増減で引く）
+        target_ym = f"{year}-{month:02d}"
+        for mk, delta in month_asset_deltas(data, current_asset_ids).items():
+            if mk >= target_ym:
+                start_balance -= delta
 
         running = start_balance
         days = []
         for d in range(1, num_days + 1):
-            actual_txs = tx_by_day.get(d, [])
+            actual_txs = tx_by_day[d]
             events = build_tx_events(actual_txs)
             for tx in actual_txs:
-                acc = get_account(data, tx.get("accountId"))
-                if acc and acc["type"] == "asset" and acc.get("class") == "current":
+                if tx.get("accountId") in current_asset_ids:
                     amt = -tx["amount"] if tx["type"] == "expense" else tx["amount"]
                     running += amt
             days.append({
@@ -961,39 +1428,42 @@ def get_calendar():
     running = hand
 
     # 未来月の場合: 今日〜対象月初の間のイベントを順算
-    if month_str > this_ym:
+    if is_future_month:
         # 当月の残りイベントを適用
-        events_remaining = build_cashflow_events(data, this_ym, 0, today)
-        for e in events_remaining:
-            if not e.get("cc"):
-                running += e["amount"]
-        # 間の月
-        cm, cy = today.month + 1, today.year
-        while True:
-            if cm > 12:
-                cm -= 12
-                cy += 1
-            if cy > year or (cy == year and cm >= month):
-                break
-            mk = f"{cy}-{cm:02d}"
-            inter_events = build_cashflow_events(data, mk, 1, today)
-            for e in inter_events:
-                if not e.get("cc"):
-                    running += e["amount"]
-            cm += 1
+        running += month_cashflow_net(data, this_ym, 0, today, pending_ids)
+        # 間の月（月を通し番号 年*12+月-1 で数え、当月の翌月〜対象月の前月を回す）
+        for idx in range(today.year * 12 + today.month, year * 12 + month - 1):
+            cy, cm = divmod(idx, 12)
+            running += month_cashflow_net(data, f"{cy}-{cm + 1:02d}", 1, today, pending_ids)
+
+    # 固定費・定期収入・CC引落を日付でバケット化（日ループ内の全件走査をなくす）
+    fc_by_day = defaultdict(list)
+    for fc in data["fixedCosts"]:
+        fc_by_day[fc["day"]].append(fc)
+    inc_by_day = defaultdict(list)
+    for inc in data["incomeSchedule"]:
+        inc_by_day[inc["day"]].append(inc)
+    fc_sums = fc_sums_by_account(data)
+    cc_by_payday = defaultdict(list)
+    for a in cc_accs:
+        cc_by_payday[a["payDay"]].append(a)
+
+    # 日ループで変わらない判定を先に日付（日）の境目として求めておく
+    # 当月: 今日より後が予定・今日以降に残高表示 / 未来月: 全日が予定・全日に残高表示
+    future_after = today.day if is_current_month else 0
+    balance_from = today.day if is_current_month else 1
+    today_day = today.day if is_current_month else None  # 当月でなければ「今日」は無い
 
     start_balance = running
     days = []
     for d in range(1, num_days + 1):
-        day_date = date(year, month, d)
         events = []
 
         # 記録済み取引を表示（CC口座へのexpense取引は除外）
-        actual_txs = tx_by_day.get(d, [])
+        actual_txs = tx_by_day[d]
         if actual_txs:
             display_txs = [tx for tx in actual_txs
-                           if not (tx["type"] == "expense" and
-                                   is_cc_account(get_account(data, tx.get("accountId"))))]
+                           if not (tx["type"] == "expense" and tx.get("accountId") in cc_ids)]
             events = build_tx_events(display_txs)
             for tx in actual_txs:
                 # 未到着収入 → 残高に反映
@@ -1001,68 +1471,54 @@ def get_calendar():
                     running += tx["amount"]
 
         # 未来日: スケジュールイベント
-        is_future = (month_str > this_ym) or (month_str == this_ym and day_date > today)
-        if is_future:
+        if d > future_after:
             # CC引落（payDay == d のCC口座）
-            for a in data["accounts"]:
-                if not is_cc_account(a):
-                    continue
-                if a.get("payDay") == d:
-                    if month_str == this_ym:
-                        total = max(0, a["balance"])
-                    else:
-                        cc_fc = sum(fc["amount"] for fc in data["fixedCosts"]
-                                    if fc.get("accountId") == a["id"])
-                        cc_det = sum(t["amount"] for t in data["transactions"]
-                                     if t["type"] == "cc_detail" and t.get("accountId") == a["id"]
-                                     and t["date"].startswith(month_str))
-                        total = cc_fc + cc_det
-                    if total > 0:
-                        events.append({
-                            "name": f"{a['name']}引落",
-                            "amount": -total,
-                            "type": "transfer",
-                            "actual": False,
-                            "cc": False,
-                        })
-                        running -= total
+            for a in cc_by_payday.get(d, ()):
+                if is_current_month:
+                    total = max(0, a["balance"])
+                else:
+                    total = fc_sums.get(a["id"], 0) + cc_det_by_acc.get(a["id"], 0)
+                if total > 0:
+                    events.append({
+                        "name": f"{a['name']}引落",
+                        "amount": -total,
+                        "type": "transfer",
+                        "actual": False,
+                        "cc": False,
+                    })
+                    running -= total
 
             # 未来の負債口座取引（支払い予定など、CC以外）→ キャッシュアウト
             for tx in actual_txs:
                 if tx["id"] in pending_ids:
                     continue
-                acc = get_account(data, tx.get("accountId"))
-                if acc and acc["type"] == "liability" and not is_cc_account(acc):
-                    if tx["type"] == "expense":
-                        running -= tx["amount"]
+                if tx["type"] == "expense" and tx.get("accountId") in other_liability_ids:
+                    running -= tx["amount"]
 
             # 固定費（CC払いは情報のみ、直接払いは残高に影響）
-            for fc in data["fixedCosts"]:
-                if fc["day"] == d:
-                    acc = get_account(data, fc.get("accountId"))
-                    is_cc_fc = is_cc_account(acc)
-                    events.append({
-                        "name": fc["name"], "amount": -fc["amount"],
-                        "type": "expense", "actual": False, "cc": is_cc_fc,
-                    })
-                    if not is_cc_fc:
-                        running -= fc["amount"]
+            for fc in fc_by_day.get(d, ()):
+                acc = get_account(data, fc.get("accountId"))
+                is_cc_fc = is_cc_account(acc)
+                events.append({
+                    "name": fc["name"], "amount": -fc["amount"],
+                    "type": "expense", "actual": False, "cc": is_cc_fc,
+                })
+                if not is_cc_fc:
+                    running -= fc["amount"]
 
             # 定期収入
-            for inc in data["incomeSchedule"]:
-                if inc["day"] == d:
-                    events.append({
-                        "name": inc["name"], "amount": inc["amount"],
-                        "type": "income", "actual": False, "cc": False,
-                    })
-                    running += inc["amount"]
+            for inc in inc_by_day.get(d, ()):
+                events.append({
+                    "name": inc["name"], "amount": inc["amount"],
+                    "type": "income", "actual": False, "cc": False,
+                })
+                running += inc["amount"]
 
-        show_balance = day_date >= today if month_str == this_ym else True
         days.append({
             "day": d, "events": events,
-            "balance": running if show_balance else None,
-            "isToday": day_date == today,
-            "isPast": day_date < today and month_str == this_ym,
+            "balance": running if d >= balance_from else None,
+            "isToday": d == today_day,
+            "isPast": d < balance_from,
         })
 
     return jsonify({
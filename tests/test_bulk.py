@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app as A  # noqa: E402
+
+
+def restart():
+    """プロセス再起動を模してメモリ上のキャッシュを捨てる"""
+    timer = A._CACHE["timer"]
+    if timer is not None:
+        timer.cancel()
+    A._CACHE.update(data=None, mtime=0, dirty=False, pending=0, timer=None)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(A, "DATA_FILE", str(tmp_path / "data.json"))
+    monkeypatch.setattr(A, "JOURNAL_FILE", str(tmp_path / "data.log"))
+    restart()
+    A.load_data()
+    yield A.app.test_client()
+    # 失敗時も未保存の変更を残さない（atexit で本来の data.json に書かれてしまう）
+    restart()
+
+
+def row(amount, account_id=1):
+    return {"date": "2026-10-01", "amount": amount, "type": "expense", "category": "食費",
+            "accountId": account_id, "tags": ["まとめ"]}
+
+
+def test_bad_row_rejects_whole_batch(client):
+    before = client.get("/api/accounts").get_json()
+
+    r = client.post("/api/transactions/bulk", json={"transactions": [row(100), row(200, 999)]})
+    assert r.status_code == 400
+    assert client.get("/api/transactions").get_json() == []
+    assert client.get("/api/accounts").get_json() == before
+    assert "まとめ" not in client.get("/api/tags").get_json()
+    assert not os.path.exists(A.JOURNAL_FILE)
+
+
+def test_rows_count_toward_save_max_pending(client, monkeypatch):
+    monkeypatch.setattr(A, "SAVE_MAX_PENDING", 5)
+
+    client.post("/api/transactions/bulk", json={"transactions": [row(1)] * 4})
+    assert A._CACHE["pending"] == 4
+    assert os.path.exists(A.JOURNAL_FILE)
+
+    # 件数ぶん数えるので、1回の登録でも上限に達すれば即時に再構築する
+    client.post("/api/transactions/bulk", json={"transactions": [row(1)]})
+    assert A._CACHE["pending"] == 0
+    assert not os.path.exists(A.JOURNAL_FILE)
+
+
+def test_replayed_bulk_is_indexed(client):
+    txs = client.post("/api/transactions/bulk",
+                      json={"transactions": [row(100), row(200), row(300)]}).get_json()
+    restart()
+
+    data = A.load_data()
+    ids = [t["id"] for t in txs]
+    assert sorted(data["_tx_by_id"]) == ids
+    assert [t["id"] for t in data["_tx_by_month"]["2026-10"]] == ids
+    assert data["_accounts_by_id"][1]["balance"] == -600
+
+    r = client.put(f"/api/transactions/{ids[1]}", json={"amount": 50})
+    assert r.status_code == 200
+    assert A.load_data()["_accounts_by_id"][1]["balance"] == -450
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app as A  # noqa: E402
+
+
+def restart():
+    """プロセス再起動を模してメモリ上のキャッシュを捨てる"""
+    timer = A._CACHE["timer"]
+    if timer is not None:
+        timer.cancel()
+    A._CACHE.update(data=None, mtime=0, dirty=False, pending=0, timer=None)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(A, "DATA_FILE", str(tmp_path / "data.json"))
+    monkeypatch.setattr(A, "JOURNAL_FILE", str(tmp_path / "data.log"))
+    restart()
+    A.load_data()
+    yield A.app.test_client()
+    # 失敗時も未保存の変更を残さない（atexit で本来の data.json に書かれてしまう）
+    restart()
+
+
+def test_torn_journal_then_appends_survive_restart(client):
+    # クラッシュで途切れた1行だけが残ったジャーナル
+    with open(A.JOURNAL_FILE, "wb") as f:
+        f.write(b'{"op":"set","key":"ta')
+    restart()
+
+    assert client.post("/api/tags", json={"tag": "旅行"}).status_code < 400
+    restart()
+    assert "旅行" in client.get("/api/tags").get_json()
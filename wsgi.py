@@ -0,0 +1,9 @@
+"""家計簿アプリ - WSGI エントリポイント
+
+データはプロセス内にキャッシュするのでワーカーは1つにし、スレッドで並列化する:
+    gunicorn -w 1 --threads 8 --preload -b 0.0.0.0:8080 wsgi:app
+更新リクエストは1件ずつ処理する。キャッシュ済みの GET はロックを取らないので更新中も待たず、
+キャッシュに無い GET だけが更新の終わりを待って本文を作る。
+"""
+
+from app import app